@@ -0,0 +1,500 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import sys
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+SHARD_PATTERN = "shard-*.jsonl"
+
+# Records are written with their index first, so most lines never need a full JSON parse.
+INDEX_PREFIX = re.compile(rb'\{"index": (\d+),')
+
+# Bytes read per step when looking for the last newline of a shard file.
+REPAIR_BLOCK_SIZE = 64 * 1024
+
+
+def iter_questions(path: str) -> t.Iterator[t.Dict[str, t.Any]]:
+    """
+    Stream questions from a JSON list, a JSON Lines file or a plain text file.
+
+    Each question is either a string or an object with a `question` key and optional
+    `metadata`. Plain text files hold one question per line. JSON Lines and text files are
+    read one line at a time; a JSON list is loaded whole.
+
+    Args:
+        path (str): Question file.
+
+    Yields:
+        Dict[str, Any]: Questions as `{"question": ..., "metadata": ...}` dicts.
+    """
+    with open(path) as f:
+        if path.endswith(".json"):
+            items = iter(json.load(f))
+        elif path.endswith(".jsonl"):
+            items = (json.loads(line) for line in f if line.strip())
+        else:
+            items = (line.strip() for line in f if line.strip())
+
+        for item in items:
+            if isinstance(item, str):
+                item = {"question": item}
+            yield {"question": item["question"], "metadata": item.get("metadata", {})}
+
+
+def _scan_record(line: bytes) -> t.Optional[t.Tuple[int, bool]]:
+    """
+    Read the question index of a shard line and whether the record is an error.
+
+    Args:
+        line (bytes): One line of a shard file.
+
+    Returns:
+        Optional[Tuple[int, bool]]: The index and whether the record has a top-level
+            `error`, or None for a line cut short by a crashed worker.
+    """
+    if not line.endswith(b"\n"):
+        return None
+    match = INDEX_PREFIX.match(line)
+    if match and b'"error"' not in line:
+        return int(match.group(1)), False
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return record["index"], "error" in record
+
+
+def index_records(paths: t.Iterable[str]) -> t.Dict[int, t.Tuple[str, int, bool]]:
+    """
+    Locate the record of each question index in the shard files without loading records.
+
+    When an index has several records, such as a failed attempt followed by a retry, a
+    record without an error wins over an error record, then later records over earlier
+    ones. Lines cut short by a crashed worker are skipped.
+
+    Args:
+        paths (Iterable[str]): Shard files.
+
+    Returns:
+        Dict[int, Tuple[str, int, bool]]: Shard file, byte offset and error flag of the
+            record per question index.
+    """
+    records = {}
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                scanned = _scan_record(line)
+                if scanned is not None:
+                    index, failed = scanned
+                    previous = records.get(index)
+                    if previous is None or not failed or previous[2]:
+                        records[index] = (path, offset, failed)
+                offset += len(line)
+    return records
+
+
+def _repair_shard(path: str) -> None:
+    """
+    Drop a partial last line left in a shard file by a crashed worker.
+
+    Without this, the first record appended on resume would be glued onto the partial line
+    and lost along with it. The file is searched backwards from its end, one block at a time.
+
+    Args:
+        path (str): Shard file.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        cut = 0
+        while end > 0:
+            start = max(0, end - REPAIR_BLOCK_SIZE)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                cut = start + newline + 1
+                break
+            end = start
+        if cut != size:
+            f.truncate(cut)
+
+
+def _build_llm() -> t.Any:
+    """
+    Create the default Anthropic model from the environment.
+
+    Returns:
+        Any: A ChatAnthropic instance.
+    """
+    from langchain_anthropic.chat_models import ChatAnthropic
+    from studio.utils import load_env_variable
+
+    return ChatAnthropic(
+        model=load_env_variable("ANTHROPIC_MODEL"),
+        api_key=load_env_variable("ANTHROPIC_API_KEY"),
+    )
+
+
+async def _process_shard(
+    input_path: str,
+    shard_path: str,
+    options: t.Dict[str, t.Any],
+) -> t.Dict[str, t.Any]:
+    """
+    Run the generation pipeline over the questions of one shard.
+
+    Questions are streamed from the shard's input file into a bounded queue drained by
+    `concurrency` tasks. Records are appended to the shard file as soon as each question
+    finishes, so an interrupted run can be resumed.
+
+    Args:
+        input_path (str): Pending questions of the shard, as JSON Lines with their index.
+        shard_path (str): Shard output file.
+        options (Dict[str, Any]): Batch options.
+
+    Returns:
+        Dict[str, Any]: Number of processed questions and the routing summary, if any.
+    """
+    from studio.models import Question
+    from studio.query_generator import QueryGenerator
+    from studio.schema import get_table_columns, load_snapshot
+    from studio.text_to_sql import Text2SQLAgent
+
+    snapshot = (
+        load_snapshot(options["schema_snapshot"])
+        if options["schema_snapshot"]
+        else None
+    )
+
+    router = None
+    llm = None
+    if options["route"]:
+        from studio.routing import ModelRouter
+
+        router = ModelRouter.from_env(
+            table_columns=get_table_columns(snapshot) if snapshot else None
+        )
+    else:
+        llm = _build_llm()
+
+    generator = None
+    if options["optimize"]:
+        generator = QueryGenerator(llm=llm, router=router)
+        generator.fit(snapshot=snapshot)
+    agent = Text2SQLAgent(
+        llm, snapshot=snapshot, router=router, profile_results=options["profile"]
+    )
+
+    concurrency = options["concurrency"]
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+    processed = 0
+
+    async def produce() -> None:
+        with open(input_path) as f:
+            for line in f:
+                await queue.put(json.loads(line))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume(out: t.TextIO) -> None:
+        nonlocal processed
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            question = Question(question=item["question"], metadata=item["metadata"])
+            try:
+                if generator is not None:
+                    question = await generator.optimize_question(question)
+                result = await agent.generate_sql(question)
+            except Exception as e:
+                result = {
+                    "input": question.question,
+                    "error": str(e),
+                    "exception_type": type(e).__name__,
+                }
+            record = {
+                "index": item["index"],
+                "question": question.question,
+                "metadata": question.metadata,
+                **result,
+            }
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            processed += 1
+
+    _repair_shard(shard_path)
+    with open(shard_path, "a") as f:
+        await asyncio.gather(produce(), *(consume(f) for _ in range(concurrency)))
+
+    return {
+        "processed": processed,
+        "routing": router.summary() if router is not None else None,
+    }
+
+
+def _run_shard(
+    shard: int,
+    input_path: str,
+    shard_path: str,
+    options: t.Dict[str, t.Any],
+) -> t.Dict[str, t.Any]:
+    """
+    Entry point of a worker process.
+
+    Args:
+        shard (int): Shard number.
+        input_path (str): Pending questions of the shard, as JSON Lines with their index.
+        shard_path (str): Shard output file.
+        options (Dict[str, Any]): Batch options.
+
+    Returns:
+        Dict[str, Any]: Shard number, processed count and routing summary.
+    """
+    summary = asyncio.run(_process_shard(input_path, shard_path, options))
+    return {"shard": shard, **summary}
+
+
+def batch(options: t.Dict[str, t.Any]) -> int:
+    """
+    Shard a question file across worker processes and merge their outputs.
+
+    Question `i` goes to shard `i % workers`. The input is streamed once and the pending
+    questions of each shard are written to their own file in the work directory, so a
+    worker only reads its share. Each worker appends its records to its own shard file.
+    The records are then merged into the output file in question order, so the output does
+    not depend on the number of workers or on completion order.
+
+    On resume, questions that already have a record are skipped. Error records count as
+    done unless `retry_errors` is set, in which case those questions run again and a
+    successful retry replaces the error in the output.
+
+    Args:
+        options (Dict[str, Any]): Batch options.
+
+    Returns:
+        int: Process exit code.
+    """
+    work_dir = options["work_dir"] or f"{options['output']}.shards"
+    os.makedirs(work_dir, exist_ok=True)
+
+    shard_paths = glob.glob(os.path.join(work_dir, SHARD_PATTERN))
+    done = set()
+    if options["resume"]:
+        done = {
+            index
+            for index, (_, _, failed) in index_records(shard_paths).items()
+            if not (failed and options["retry_errors"])
+        }
+    if not options["resume"]:
+        for path in shard_paths:
+            os.remove(path)
+
+    workers = options["workers"]
+    names = [f"{shard:04d}-of-{workers:04d}.jsonl" for shard in range(workers)]
+    input_paths = [os.path.join(work_dir, f"pending-{name}") for name in names]
+    pending = [0] * workers
+    total = 0
+
+    inputs = [open(path, "w") for path in input_paths]
+    try:
+        for index, item in enumerate(iter_questions(options["input"])):
+            total += 1
+            if index in done:
+                continue
+            shard = index % workers
+            inputs[shard].write(json.dumps({"index": index, **item}) + "\n")
+            pending[shard] += 1
+    finally:
+        for f in inputs:
+            f.close()
+
+    print(
+        f"{sum(pending)} pending, {len(done)} already done, {workers} workers",
+        file=sys.stderr,
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                _run_shard,
+                shard,
+                input_paths[shard],
+                os.path.join(work_dir, f"shard-{names[shard]}"),
+                options,
+            )
+            for shard in range(workers)
+            if pending[shard]
+        ]
+        for future in futures:
+            summary = future.result()
+            print(json.dumps(summary), file=sys.stderr)
+
+    for path in input_paths:
+        os.remove(path)
+
+    return merge(work_dir, options["output"], total)
+
+
+def merge(work_dir: str, output: str, expected: int) -> int:
+    """
+    Merge shard files into a single output file ordered by question index.
+
+    Records are copied line by line from the shard files, so only their offsets are held in
+    memory. The output is written even when some questions have no record.
+
+    Args:
+        work_dir (str): Directory holding the shard files.
+        output (str): Output JSON Lines file.
+        expected (int): Number of questions in the input.
+
+    Returns:
+        int: Process exit code, non-zero if some questions have no record.
+    """
+    records = index_records(glob.glob(os.path.join(work_dir, SHARD_PATTERN)))
+    missing = sum(index not in records for index in range(expected))
+    failed = sum(records[index][2] for index in range(expected) if index in records)
+
+    shards: t.Dict[str, t.BinaryIO] = {}
+    try:
+        with open(output, "wb") as f:
+            for index in sorted(records):
+                if index >= expected:
+                    continue
+                path, offset, _ = records[index]
+                if path not in shards:
+                    shards[path] = open(path, "rb")
+                shards[path].seek(offset)
+                f.write(shards[path].readline())
+    finally:
+        for shard in shards.values():
+            shard.close()
+
+    if failed:
+        print(
+            f"{failed} questions have an error record; re-run with --retry-errors to retry them.",
+            file=sys.stderr,
+        )
+    if missing:
+        print(
+            f"{missing} questions have no result; re-run the same command to resume them.",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+def check_imports(options: t.Dict[str, t.Any]) -> int:
+    """
+    Report the cold import time of the studio modules against the startup budget.
+
+    Args:
+        options (Dict[str, Any]): Command options.
+
+    Returns:
+        int: Process exit code, non-zero if a module exceeds the budget.
+    """
+    from studio.utils import STUDIO_MODULES, measure_import_time
+
+    exit_code = 0
+    for module in STUDIO_MODULES:
+        seconds = measure_import_time(module)
+        over = seconds > options["budget"]
+        exit_code = exit_code or int(over)
+        print(f"{module}: {seconds:.3f}s{' (over budget)' if over else ''}")
+    return exit_code
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from studio.utils import IMPORT_TIME_BUDGET
+
+    parser = argparse.ArgumentParser(prog="query-studio")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Generate SQL for a question file across worker processes."
+    )
+    batch_parser.add_argument("input", help="Question file (.json, .jsonl or text).")
+    batch_parser.add_argument(
+        "-o", "--output", required=True, help="Output JSON Lines file."
+    )
+    batch_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes.",
+    )
+    batch_parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Concurrent questions per worker.",
+    )
+    batch_parser.add_argument(
+        "--work-dir", help="Directory for shard files. Defaults to <output>.shards."
+    )
+    batch_parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="Discard existing shard files instead of skipping finished questions.",
+    )
+    batch_parser.add_argument(
+        "--retry-errors",
+        action="store_true",
+        help="On resume, run questions whose record is an error again.",
+    )
+    batch_parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Optimize each question with QueryGenerator before generating SQL.",
+    )
+    batch_parser.add_argument(
+        "--schema-snapshot", help="Schema snapshot file produced by studio.schema."
+    )
+    batch_parser.add_argument(
+        "--route",
+        action="store_true",
+        help="Route questions between ANTHROPIC_FAST_MODEL and ANTHROPIC_MODEL.",
+    )
+    batch_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Stream each query result and store a profile next to the sample rows.",
+    )
+    batch_parser.set_defaults(func=batch)
+
+    imports_parser = subparsers.add_parser(
+        "check-imports", help="Check the import time of the studio modules."
+    )
+    imports_parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET)
+    imports_parser.set_defaults(func=check_imports)
+
+    return parser
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    args = build_parser().parse_args(argv)
+    options = vars(args)
+    func = options.pop("func")
+    return func(options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
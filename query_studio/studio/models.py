@@ -6,3 +6,39 @@ from pydantic import BaseModel, Field
 class Question(BaseModel):
     question: str = Field(...)
     metadata: t.Dict[str, t.Any] = Field(default_factory=dict)
+
+
+class ColumnInfo(BaseModel):
+    name: str = Field(...)
+    data_type: str = Field(...)
+    nullable: bool = Field(default=True)
+    primary_key: bool = Field(default=False)
+    references: t.Optional[str] = Field(default=None)
+    comment: t.Optional[str] = Field(default=None)
+    sample_values: t.List[str] = Field(default_factory=list)
+
+
+class TableInfo(BaseModel):
+    name: str = Field(...)
+    comment: t.Optional[str] = Field(default=None)
+    row_estimate: t.Optional[int] = Field(default=None)
+    columns: t.List[ColumnInfo] = Field(default_factory=list)
+
+
+class SchemaSnapshot(BaseModel):
+    version: int = Field(...)
+    schema_name: str = Field(...)
+    created_at: str = Field(...)
+    fingerprint: str = Field(...)
+    tables: t.List[TableInfo] = Field(default_factory=list)
+
+
+class RoutingDecision(BaseModel):
+    question: str = Field(...)
+    stage: str = Field(...)
+    tier: str = Field(...)
+    score: int = Field(default=0)
+    tables: t.List[str] = Field(default_factory=list)
+    reasons: t.List[str] = Field(default_factory=list)
+    escalated: bool = Field(default=False)
+    latency: t.Optional[float] = Field(default=None)
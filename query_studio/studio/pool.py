@@ -0,0 +1,280 @@
+import re
+import threading
+import time
+import typing as t
+
+READ_ONLY_STATEMENTS = ("select", "with", "explain", "show", "values", "table")
+
+# Statements accepted by DECLARE CURSOR, and so by psycopg2 named cursors.
+CURSOR_STATEMENTS = ("select", "with", "values", "table")
+
+WRITE_KEYWORDS = re.compile(
+    r"\b(insert|update|delete|merge|create|alter|drop|truncate|grant|revoke|copy|vacuum|call)\b",
+    re.IGNORECASE,
+)
+
+# SQLSTATEs of a server shutting down or not yet accepting connections.
+SHUTDOWN_CODES = ("57P01", "57P02", "57P03")
+
+COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def is_read_only(sql_code: str) -> bool:
+    """
+    Check whether a SQL statement only reads data and can run on a replica.
+
+    Args:
+        sql_code (str): SQL code.
+
+    Returns:
+        bool: True if the statement starts with a read-only keyword and contains no write keyword.
+    """
+    code = COMMENTS.sub(" ", sql_code).strip().lstrip("(").lower()
+    if not code.startswith(READ_ONLY_STATEMENTS):
+        return False
+    return WRITE_KEYWORDS.search(code) is None
+
+
+def can_declare_cursor(sql_code: str) -> bool:
+    """
+    Check whether a SQL statement can run on a server-side cursor.
+
+    Args:
+        sql_code (str): SQL code.
+
+    Returns:
+        bool: True for read-only `SELECT`, `WITH`, `VALUES` and `TABLE` statements.
+    """
+    code = COMMENTS.sub(" ", sql_code).strip().lstrip("(").lower()
+    return code.startswith(CURSOR_STATEMENTS) and is_read_only(sql_code)
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """
+    Check whether an exception means the endpoint itself is unavailable.
+
+    psycopg2 raises `OperationalError` for errors caused by the query too, such as running out
+    of memory or temp space, a statement that is too complex or a lock that is not available.
+    Only errors without a SQLSTATE, connection exceptions (class 08) and server shutdowns
+    (57P01 to 57P03) count, so a heavy query never ejects a healthy endpoint.
+
+    Args:
+        exc (BaseException): Exception raised while running a query.
+
+    Returns:
+        bool: True for connection-level psycopg2 or SQLAlchemy errors.
+    """
+    import psycopg2
+    from sqlalchemy import exc as sa_exc
+
+    if not isinstance(
+        exc,
+        (
+            psycopg2.OperationalError,
+            psycopg2.InterfaceError,
+            sa_exc.OperationalError,
+            sa_exc.InterfaceError,
+        ),
+    ):
+        return False
+
+    original = getattr(exc, "orig", None) if isinstance(exc, sa_exc.DBAPIError) else exc
+    code = getattr(original, "pgcode", None)
+    return code is None or code.startswith("08") or code in SHUTDOWN_CODES
+
+
+def check_endpoint_health(config: t.Dict[str, str], timeout: int = 3) -> bool:
+    """
+    Check that an endpoint accepts connections and answers a trivial query.
+
+    Args:
+        config (Dict[str, str]): Database configuration of the endpoint.
+        timeout (int): Connection timeout in seconds.
+
+    Returns:
+        bool: True if the endpoint is healthy.
+    """
+    import psycopg2
+
+    try:
+        connection = psycopg2.connect(**config, connect_timeout=timeout)
+    except psycopg2.Error:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            return cursor.fetchone() == (1,)
+    except psycopg2.Error:
+        return False
+    finally:
+        connection.close()
+
+
+class Endpoint:
+    __slots__ = (
+        "config",
+        "name",
+        "outstanding",
+        "failures",
+        "ejected_until",
+        "probing",
+    )
+
+    def __init__(self, config: t.Dict[str, str]):
+        self.config = config
+        self.name = f"{config['host']}:{config['port']}"
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.probing = False
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name}, outstanding={self.outstanding}, failures={self.failures})"
+
+
+class EndpointBalancer:
+    def __init__(
+        self,
+        endpoints: t.List[t.Dict[str, str]],
+        max_failures: int = 3,
+        ejection_time: float = 30.0,
+        health_check: t.Callable[[t.Dict[str, str]], bool] = check_endpoint_health,
+        is_fault: t.Callable[[BaseException], bool] = is_connection_error,
+    ):
+        """
+        Initialize the EndpointBalancer.
+
+        Read-only queries go to the healthy endpoint with the fewest outstanding requests. Writes
+        always go to the primary, the first endpoint. An endpoint that fails `max_failures` times
+        in a row is ejected for `ejection_time` seconds, then health-checked before it is used again.
+
+        Args:
+            endpoints (List[Dict[str, str]]): Database configurations, primary first.
+            max_failures (int): Consecutive failures after which an endpoint is ejected.
+            ejection_time (float): Seconds an ejected endpoint is left out of rotation.
+            health_check (Callable[[Dict[str, str]], bool]): Checks an endpoint before it is reinstated.
+            is_fault (Callable[[BaseException], bool]): Tells endpoint failures apart from query errors.
+        """
+        if not endpoints:
+            raise ValueError("At least one database endpoint is required.")
+
+        self.endpoints = [Endpoint(config) for config in endpoints]
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.health_check = health_check
+        self.is_fault = is_fault
+        self._lock = threading.Lock()
+        self._turn = 0
+
+    @property
+    def primary(self) -> Endpoint:
+        return self.endpoints[0]
+
+    def _probe(self, endpoint: Endpoint) -> None:
+        try:
+            healthy = self.health_check(endpoint.config)
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            endpoint.probing = False
+            if healthy:
+                endpoint.failures = 0
+                endpoint.ejected_until = 0.0
+            else:
+                endpoint.ejected_until = time.monotonic() + self.ejection_time
+
+    def choose(
+        self, read_only: bool = True, exclude: t.Collection[Endpoint] = ()
+    ) -> Endpoint:
+        """
+        Choose the endpoint for the next query and count it as outstanding.
+
+        An ejected endpoint whose ejection time has passed is health-checked by the first
+        caller that sees it; concurrent callers leave it out until the check is done. The
+        caller must hand the endpoint back with `release` once the query is finished.
+
+        Args:
+            read_only (bool): Whether the query can run on a replica.
+            exclude (Collection[Endpoint]): Endpoints that already failed for this query.
+
+        Returns:
+            Endpoint: The endpoint with the fewest outstanding requests, ties broken round-robin.
+        """
+        if read_only:
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    e
+                    for e in self.endpoints
+                    if e.ejected_until and e.ejected_until <= now and not e.probing
+                ]
+                for endpoint in expired:
+                    endpoint.probing = True
+            for endpoint in expired:
+                self._probe(endpoint)
+
+        with self._lock:
+            if not read_only:
+                endpoint = self.primary
+            else:
+                remaining = [e for e in self.endpoints if e not in exclude]
+                remaining = remaining or self.endpoints
+                candidates = [e for e in remaining if not e.ejected_until] or remaining
+                fewest = min(e.outstanding for e in candidates)
+                tied = [e for e in candidates if e.outstanding == fewest]
+                self._turn += 1
+                endpoint = tied[self._turn % len(tied)]
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def report_success(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.failures = 0
+
+    def report_failure(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.failures += 1
+            if endpoint.failures >= self.max_failures:
+                endpoint.ejected_until = time.monotonic() + self.ejection_time
+
+    def execute(
+        self, func: t.Callable[[Endpoint], t.Any], read_only: bool = True
+    ) -> t.Any:
+        """
+        Run a query function on a balanced endpoint, failing over on endpoint errors.
+
+        Args:
+            func (Callable[[Endpoint], Any]): Runs the query against the given endpoint.
+            read_only (bool): Whether the query can run on a replica.
+
+        Returns:
+            Any: The result of `func`.
+
+        Raises:
+            Exception: The last endpoint error once every endpoint has been tried, or any
+                error that is not an endpoint failure.
+        """
+        tried: t.List[Endpoint] = []
+
+        while True:
+            endpoint = self.choose(read_only=read_only, exclude=tried)
+            try:
+                result = func(endpoint)
+            except Exception as e:
+                if not self.is_fault(e):
+                    raise
+                self.report_failure(endpoint)
+                tried.append(endpoint)
+                if not read_only or len(tried) >= len(self.endpoints):
+                    raise
+                continue
+            finally:
+                self.release(endpoint)
+
+            self.report_success(endpoint)
+            return result
@@ -0,0 +1,244 @@
+import typing as t
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# Values tracked per column for the top-k estimate, as a multiple of k.
+TOP_K_CAPACITY_FACTOR = 10
+
+
+def _to_python(value: t.Any) -> t.Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ColumnProfile:
+    """
+    Incremental summary statistics of one result column.
+
+    Distinct values are estimated with a k-minimum-values sketch over 64-bit hashes. Top
+    values are tracked with a Misra-Gries summary of `top_k * TOP_K_CAPACITY_FACTOR`
+    counters, merged chunk by chunk. Every value that makes up more than `1 / (capacity + 1)`
+    of the non-null rows is kept, and its count is a lower bound that is off by at most that
+    many rows.
+
+    A nullable integer column comes back as float64 in chunks that hold a NULL and as int64
+    in the others, and bools as object or bool. Values are cast to one dtype per kind before
+    hashing and counting so the same value is never counted twice. Integer columns are
+    reported as integers again.
+    """
+
+    __slots__ = (
+        "name",
+        "top_k",
+        "sketch_size",
+        "count",
+        "nulls",
+        "numeric_count",
+        "total",
+        "minimum",
+        "maximum",
+        "sketch",
+        "counts",
+        "integral",
+    )
+
+    def __init__(self, name: str, top_k: int = 5, sketch_size: int = 1024):
+        self.name = name
+        self.top_k = top_k
+        self.sketch_size = sketch_size
+        self.count = 0
+        self.nulls = 0
+        self.numeric_count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = np.empty(0, dtype=np.uint64)
+        self.counts = pd.Series(dtype="int64")
+        self.integral = True
+
+    def update(self, series: pd.Series) -> None:
+        """
+        Fold a chunk of the column into the profile.
+
+        Args:
+            series (pd.Series): Column values of one chunk.
+        """
+        self.count += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+
+        values = self._canonical(values)
+        numeric = self._numeric(values)
+        if numeric is not None:
+            self.numeric_count += len(numeric)
+            self.total += float(numeric.sum())
+        try:
+            self._update_range(values.min(), values.max())
+        except TypeError:
+            pass
+
+        try:
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+            counts = values.value_counts(sort=False)
+        except TypeError:
+            values = values.astype(str)
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+            counts = values.value_counts(sort=False)
+
+        self.sketch = np.union1d(self.sketch, hashes)[: self.sketch_size]
+
+        merged = self.counts.add(counts, fill_value=0).astype("int64")
+        capacity = self.top_k * TOP_K_CAPACITY_FACTOR
+        if len(merged) > capacity:
+            threshold = merged.nlargest(capacity + 1).iloc[-1]
+            merged = merged[merged > threshold] - threshold
+        self.counts = merged
+
+    def _canonical(self, values: pd.Series) -> pd.Series:
+        if pd.api.types.is_bool_dtype(values):
+            return values.astype(object)
+        if pd.api.types.is_numeric_dtype(values):
+            values = values.astype("float64")
+            self.integral = self.integral and bool((values % 1 == 0).all())
+        return values
+
+    def _output(self, value: t.Any) -> t.Any:
+        value = _to_python(value)
+        if self.integral and isinstance(value, float):
+            return int(value)
+        return value
+
+    @staticmethod
+    def _numeric(values: pd.Series) -> t.Optional[pd.Series]:
+        if pd.api.types.is_bool_dtype(values):
+            return None
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype(float)
+        if isinstance(values.iloc[0], Decimal):
+            return pd.to_numeric(values, errors="coerce").dropna().astype(float)
+        return None
+
+    def _update_range(self, minimum: t.Any, maximum: t.Any) -> None:
+        if self.minimum is None or minimum < self.minimum:
+            self.minimum = minimum
+        if self.maximum is None or maximum > self.maximum:
+            self.maximum = maximum
+
+    def distinct(self) -> int:
+        """
+        Estimate the number of distinct non-null values.
+
+        Returns:
+            int: Exact count below `sketch_size` distinct values, otherwise a KMV estimate.
+        """
+        if len(self.sketch) < self.sketch_size:
+            return len(self.sketch)
+        kth = float(self.sketch[-1]) / float(np.iinfo(np.uint64).max)
+        return int((self.sketch_size - 1) / kth)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        top = self.counts.nlargest(self.top_k)
+        return {
+            "nulls": self.nulls,
+            "min": self._output(self.minimum),
+            "max": self._output(self.maximum),
+            "mean": self.total / self.numeric_count if self.numeric_count else None,
+            "distinct": self.distinct(),
+            "top": [[self._output(v), int(c)] for v, c in top.items()],
+        }
+
+
+class ResultProfiler:
+    def __init__(
+        self,
+        columns: t.List[str],
+        sample_size: int = 5,
+        top_k: int = 5,
+        sketch_size: int = 1024,
+    ):
+        """
+        Initialize the ResultProfiler.
+
+        Args:
+            columns (List[str]): Column names of the result.
+            sample_size (int): Number of leading rows kept as sample records.
+            top_k (int): Number of most frequent values reported per column.
+            sketch_size (int): Size of the distinct-count sketch per column.
+        """
+        self.columns = columns
+        self.sample_size = sample_size
+        self.row_count = 0
+        self.samples: t.List[t.Dict[str, t.Any]] = []
+        self.profiles = [
+            ColumnProfile(name, top_k=top_k, sketch_size=sketch_size)
+            for name in columns
+        ]
+
+    def update(self, rows: t.List[tuple]) -> None:
+        """
+        Fold a chunk of rows into the profile.
+
+        Args:
+            rows (List[tuple]): Rows of one chunk, in `columns` order.
+        """
+        if not rows:
+            return
+
+        df = pd.DataFrame.from_records(rows, columns=range(len(self.columns)))
+        self.row_count += len(df)
+
+        if len(self.samples) < self.sample_size:
+            head = df.head(self.sample_size - len(self.samples))
+            self.samples.extend(
+                head.set_axis(self.columns, axis=1).to_dict(orient="records")
+            )
+
+        for i, profile in enumerate(self.profiles):
+            profile.update(df[i])
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "row_count": self.row_count,
+            "columns": {
+                name: profile.to_dict()
+                for name, profile in zip(self.columns, self.profiles)
+            },
+        }
+
+
+def profile_cursor(
+    cursor: t.Any, chunk_size: int = 10000, **kwargs: t.Any
+) -> t.Tuple[t.List[t.Dict[str, t.Any]], t.Dict[str, t.Any]]:
+    """
+    Profile the result of an executed query chunk by chunk.
+
+    Only one chunk is held in memory at a time, so the cursor should be a server-side cursor
+    for large results.
+
+    Args:
+        cursor (Any): Cursor of an executed query.
+        chunk_size (int): Rows fetched per chunk.
+        **kwargs: Additional keyword arguments passed to `ResultProfiler`.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, Any]]: The sample records and the result profile.
+    """
+    empty = [], {"row_count": 0, "columns": {}}
+
+    # A named cursor only has a description after its first fetch, while fetching from a
+    # client-side cursor without a result set raises.
+    if getattr(cursor, "name", None) is None and cursor.description is None:
+        return empty
+    rows = cursor.fetchmany(chunk_size)
+    if cursor.description is None:
+        return empty
+
+    profiler = ResultProfiler([desc[0] for desc in cursor.description], **kwargs)
+    while rows:
+        profiler.update(rows)
+        rows = cursor.fetchmany(chunk_size)
+
+    return profiler.samples, profiler.to_dict()
@@ -1,16 +1,22 @@
+from __future__ import annotations
+
 import json
+import time
 import typing as t
 import warnings
 
-from langchain_anthropic.chat_models import ChatAnthropic
-from langchain_core.language_models.base import BaseLanguageModel
-from langchain_core.output_parsers.string import StrOutputParser
 from studio.defaults import DEFAULT_TABLE_DESCRIPTIONS, DEFAULT_TABLE_SCHEMA
-from studio.models import Question
-from studio.prompts import NL_QUESTION_GENERATOR_PROMPT, QUERY_OPTIMIZATION_PROMPT
+from studio.models import Question, SchemaSnapshot
+from studio.routing import FAST, OPTIMIZE, STRONG
+from studio.schema import render_table_descriptions, render_table_schema
 from studio.utils import load_env
 from tqdm import tqdm
 
+if t.TYPE_CHECKING:
+    from langchain_core.language_models.base import BaseLanguageModel
+    from studio.records import QuestionStore
+    from studio.routing import ModelRouter
+
 
 class QueryGenerator:
     def __init__(
@@ -18,6 +24,7 @@ class QueryGenerator:
         llm: BaseLanguageModel,
         model: t.Optional[str] = None,
         api_key: t.Optional[str] = None,
+        router: t.Optional[ModelRouter] = None,
         **kwargs,
     ):
         """
@@ -27,10 +34,16 @@ class QueryGenerator:
             llm (BaseLanguageModel): The language model to use for generating queries.
             model (t.Optional[str]): The model name to use for generating queries.
             api_key (t.Optional[str]): The API key for authentication.
+            router (t.Optional[ModelRouter]): Routes each question to a fast or strong model
+                when optimizing queries. Defaults to using `llm` for everything.
             **kwargs: Additional keyword arguments.
         """
 
-        if llm is None:
+        self.router = router
+
+        if llm is None and router is not None:
+            self.llm = router.strong_llm
+        elif llm is None:
             env = load_env()
             model = model if model else env.get("ANTHROPIC_MODEL")
             api_key = api_key if api_key else env.get("ANTHROPIC_API_KEY")
@@ -39,6 +52,8 @@ class QueryGenerator:
                 raise ValueError(
                     "Model and API key must be provided either as arguments or in the environment file."
                 )
+            from langchain_anthropic.chat_models import ChatAnthropic
+
             self.llm = ChatAnthropic(model=model, api_key=api_key)
         else:
             self.llm = llm
@@ -50,12 +65,24 @@ class QueryGenerator:
         """
         Build the chains for generating natural language questions and optimizing queries.
         """
+        from langchain_core.output_parsers.string import StrOutputParser
+        from studio.prompts import (
+            NL_QUESTION_GENERATOR_PROMPT,
+            QUERY_OPTIMIZATION_PROMPT,
+        )
+
         self.generator_chain = (
             NL_QUESTION_GENERATOR_PROMPT | self.llm | StrOutputParser()
         )
 
         self.optimizer_chain = QUERY_OPTIMIZATION_PROMPT | self.llm | StrOutputParser()
 
+        if self.router is not None:
+            self.optimizer_chains = {
+                tier: QUERY_OPTIMIZATION_PROMPT | llm | StrOutputParser()
+                for tier, llm in self.router.llms.items()
+            }
+
     @staticmethod
     async def _generate_with_retry(
         chain: t.Any, input_dict: t.Dict[str, t.Any], max_retries: int
@@ -81,14 +108,31 @@ class QueryGenerator:
                 if retries > max_retries:
                     raise Exception(f"Error processing question: {e}")
 
-    def fit(self, table_descriptions: str = None, table_schema: str = None) -> None:
+    def fit(
+        self,
+        table_descriptions: str = None,
+        table_schema: str = None,
+        snapshot: t.Optional[SchemaSnapshot] = None,
+    ) -> None:
         """
         Fit the QueryGenerator with table descriptions and schema.
 
         Args:
             table_descriptions (str): Descriptions of the tables.
             table_schema (str): Schema of the tables.
+            snapshot (Optional[SchemaSnapshot]): Introspected schema snapshot used for
+                whichever of the descriptions or schema is not provided.
         """
+        if snapshot is not None:
+            table_schema = (
+                table_schema if table_schema else render_table_schema(snapshot)
+            )
+            table_descriptions = (
+                table_descriptions
+                if table_descriptions
+                else render_table_descriptions(snapshot)
+            )
+
         if (table_descriptions is None) or (table_schema is None):
             warnings.warn(
                 "No table descriptions or schema provided. Using default values."
@@ -127,45 +171,98 @@ class QueryGenerator:
         ]
 
     async def optimize_query(
-        self, questions: t.Union[t.List[str], t.List[Question]]
-    ) -> t.List[Question]:
+        self,
+        questions: t.Union[t.List[str], t.List[Question]],
+        store: t.Optional[QuestionStore] = None,
+    ) -> t.Sequence[Question]:
         """
         Optimize the given questions for SQL conversion.
 
         Args:
             questions (t.Union[t.List[str], t.List[Question]]): The questions to optimize.
+            store (t.Optional[QuestionStore]): Compact store to append optimized questions to, for large runs.
 
         Returns:
-            t.List[Question]: A list of optimized questions.
+            t.Sequence[Question]: A list of optimized questions, or the given `store` when provided.
         """
 
-        revised_questions = []
+        revised_questions = store if store is not None else []
 
         for question in tqdm(questions):
-            if isinstance(question, Question):
-                q = question.question
-                metadata = question.metadata
-            elif isinstance(question, str):
-                q = question
-                metadata = {}
-
-            input_dict = dict(
-                table_descriptions=self.table_descriptions,
-                table_schema=self.table_schema,
-                question=q,
-            )
+            revised_questions.append(await self.optimize_question(question))
+
+        return revised_questions
+
+    async def optimize_question(self, question: t.Union[str, Question]) -> Question:
+        """
+        Optimize a single question for SQL conversion.
+
+        Args:
+            question (t.Union[str, Question]): The question to optimize.
+
+        Returns:
+            Question: The optimized question.
+        """
+        if isinstance(question, Question):
+            q = question.question
+            metadata = question.metadata
+        elif isinstance(question, str):
+            q = question
+            metadata = {}
 
+        input_dict = dict(
+            table_descriptions=self.table_descriptions,
+            table_schema=self.table_schema,
+            question=q,
+        )
+
+        if self.router is None:
             results = await self._generate_with_retry(
                 self.optimizer_chain, input_dict, self.max_retries
             )
-
             results = json.loads(results)
+        else:
+            results = await self._optimize_with_routing(q, input_dict)
+
+        return Question(
+            question=results.pop("optimized_question"),
+            metadata={**results, "nl_question": q, **metadata},
+        )
+
+    async def _optimize_with_routing(
+        self, question: str, input_dict: t.Dict[str, t.Any]
+    ) -> t.Dict[str, t.Any]:
+        """
+        Optimize a question on the tier chosen by the router, escalating failures to the strong tier.
+
+        The fast tier gets a single attempt; retries are left to the strong tier.
 
-            revised_questions.append(
-                Question(
-                    question=results.pop("optimized_question"),
-                    metadata={**results, "nl_question": q, **metadata},
+        Args:
+            question (str): The question to optimize.
+            input_dict (t.Dict[str, t.Any]): The input dictionary for the optimizer chain.
+
+        Returns:
+            t.Dict[str, t.Any]: The parsed optimizer output, including the `model_tier` used.
+        """
+        decision = self.router.route(question, stage=OPTIMIZE)
+        start = time.perf_counter()
+
+        if decision.tier == FAST:
+            try:
+                results = json.loads(
+                    await self.optimizer_chains[FAST].ainvoke(input_dict)
                 )
-            )
+            except Exception as e:
+                cause = f"{type(e).__name__}: {e}"
+            else:
+                if results.get("optimized_question"):
+                    self.router.record(decision, time.perf_counter() - start)
+                    return {**results, "model_tier": decision.tier}
+                cause = "no optimized question"
+            decision = self.router.escalate(decision, cause)
 
-        return revised_questions
+        results = await self._generate_with_retry(
+            self.optimizer_chains[STRONG], input_dict, self.max_retries
+        )
+        self.router.record(decision, time.perf_counter() - start)
+        return {**json.loads(results), "model_tier": decision.tier}
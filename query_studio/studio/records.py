@@ -0,0 +1,225 @@
+import json
+import sys
+import tempfile
+import typing as t
+from collections.abc import Sequence
+
+from studio.models import Question
+
+# Result fields that can grow large and are spilled to disk past the threshold.
+BLOB_FIELDS = frozenset({"chain_of_thought", "traceback", "data"})
+
+# Strings up to this length are interned; longer ones are unlikely to repeat.
+INTERN_MAX_LENGTH = 64
+
+
+class _Row:
+    """A record stored as a shared key tuple and a value tuple."""
+
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys: t.Tuple[str, ...], values: t.Tuple[t.Any, ...]):
+        self.keys = keys
+        self.values = values
+
+
+class _Records:
+    """Tabular `data` records stored as one column tuple and row tuples."""
+
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns: t.Tuple[str, ...], rows: t.Tuple[tuple, ...]):
+        self.columns = columns
+        self.rows = rows
+
+
+class _Blob:
+    """A JSON-encoded value, either held in memory or spilled to disk."""
+
+    __slots__ = ("payload", "offset", "length")
+
+    def __init__(
+        self, payload: t.Optional[bytes] = None, offset: int = -1, length: int = 0
+    ):
+        self.payload = payload
+        self.offset = offset
+        self.length = length
+
+
+def _intern(value: t.Any) -> t.Any:
+    """
+    Intern short strings, recursing into lists, tuples and dicts.
+
+    Args:
+        value (Any): Value to intern.
+
+    Returns:
+        Any: The value with short strings interned and lists turned into tuples.
+    """
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= INTERN_MAX_LENGTH else value
+    if isinstance(value, (list, tuple)):
+        return tuple(_intern(v) for v in value)
+    if isinstance(value, dict):
+        return {_intern(k): _intern(v) for k, v in value.items()}
+    return value
+
+
+def _restore(value: t.Any) -> t.Any:
+    """
+    Undo the tuple conversion of `_intern`, returning lists as they were stored.
+
+    Args:
+        value (Any): Stored value.
+
+    Returns:
+        Any: The value with tuples turned back into lists.
+    """
+    if isinstance(value, tuple):
+        return [_restore(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _restore(v) for k, v in value.items()}
+    return value
+
+
+class RecordStore(Sequence):
+    blob_fields: t.FrozenSet[str] = frozenset()
+
+    def __init__(self, spill_path: t.Optional[str] = None, spill_threshold: int = 1024):
+        """
+        Initialize a compact, append-only record store.
+
+        Rows are kept as slotted objects with shared key tuples and interned strings. Blob
+        fields are JSON-encoded, and those larger than `spill_threshold` bytes are written to
+        a spill file and read back on access.
+
+        Args:
+            spill_path (Optional[str]): File to spill large blobs to. Defaults to an anonymous temporary file.
+            spill_threshold (int): Encoded size in bytes from which blobs are spilled to disk.
+        """
+        self.spill_threshold = spill_threshold
+        self._spill = (
+            open(spill_path, "w+b") if spill_path else tempfile.TemporaryFile()
+        )
+        self._spill_size = 0
+        self._rows: t.List[_Row] = []
+        self._keys: t.Dict[t.Tuple[str, ...], t.Tuple[str, ...]] = {}
+
+    def _encode_blob(self, value: t.Any) -> _Blob:
+        payload = json.dumps(value, default=str).encode("utf-8")
+        if len(payload) < self.spill_threshold:
+            return _Blob(payload=payload)
+
+        self._spill.seek(self._spill_size)
+        self._spill.write(payload)
+        blob = _Blob(offset=self._spill_size, length=len(payload))
+        self._spill_size += len(payload)
+        return blob
+
+    def _decode_blob(self, blob: _Blob) -> t.Any:
+        if blob.payload is not None:
+            return json.loads(blob.payload)
+        self._spill.seek(blob.offset)
+        return json.loads(self._spill.read(blob.length))
+
+    def _pack_value(self, key: str, value: t.Any) -> t.Any:
+        if key in self.blob_fields and value is not None:
+            return self._encode_blob(value)
+        return _intern(value)
+
+    def _unpack_value(self, value: t.Any) -> t.Any:
+        if isinstance(value, _Blob):
+            return self._decode_blob(value)
+        return _restore(value)
+
+    def _pack(self, items: t.Iterable[t.Tuple[str, t.Any]]) -> _Row:
+        items = list(items)
+        keys = tuple(sys.intern(k) for k, _ in items)
+        keys = self._keys.setdefault(keys, keys)
+        values = tuple(self._pack_value(k, v) for k, v in items)
+        return _Row(keys, values)
+
+    def _unpack(self, row: _Row) -> t.Dict[str, t.Any]:
+        return {k: self._unpack_value(v) for k, v in zip(row.keys, row.values)}
+
+    def append(self, record: t.Any) -> None:
+        self._rows.append(self._pack(record.items()))
+
+    def extend(self, records: t.Iterable[t.Any]) -> None:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: t.Union[int, slice]) -> t.Any:
+        if isinstance(index, slice):
+            return [self._unpack(row) for row in self._rows[index]]
+        return self._unpack(self._rows[index])
+
+    def close(self) -> None:
+        """
+        Close the spill file. Spilled blobs can no longer be read afterwards.
+        """
+        self._spill.close()
+
+    def __enter__(self) -> "RecordStore":
+        return self
+
+    def __exit__(self, *exc_info: t.Any) -> None:
+        self.close()
+
+
+class ResultStore(RecordStore):
+    """
+    Compact store for `Text2SQLAgent` results.
+
+    Indexing returns the same result dicts that `generate_sql_from_text` produces. Record
+    lists in `data` are stored as one tuple per row under a single shared column list, and
+    blobs are JSON round-tripped, so non-JSON values inside chain of thought, tracebacks or
+    error payloads come back as strings.
+    """
+
+    blob_fields = BLOB_FIELDS
+
+    def _pack_value(self, key: str, value: t.Any) -> t.Any:
+        if (
+            key == "data"
+            and isinstance(value, list)
+            and value
+            and all(isinstance(r, dict) for r in value)
+        ):
+            columns = tuple(value[0])
+            if all(tuple(r) == columns for r in value):
+                return _Records(
+                    columns=_intern(columns),
+                    rows=tuple(tuple(_intern(v) for v in r.values()) for r in value),
+                )
+        return super()._pack_value(key, value)
+
+    def _unpack_value(self, value: t.Any) -> t.Any:
+        if isinstance(value, _Records):
+            return [dict(zip(value.columns, map(_restore, row))) for row in value.rows]
+        return super()._unpack_value(value)
+
+
+class QuestionStore(RecordStore):
+    """
+    Compact store for `Question` items.
+
+    Indexing returns `Question` instances, rebuilt from the stored text and metadata.
+    """
+
+    def append(self, record: t.Union[str, Question]) -> None:
+        if isinstance(record, str):
+            record = Question(question=record)
+        self._rows.append(
+            self._pack([("question", record.question), *record.metadata.items()])
+        )
+
+    def _unpack(self, row: _Row) -> Question:
+        question, *metadata = zip(row.keys, row.values)
+        return Question(
+            question=question[1],
+            metadata={k: self._unpack_value(v) for k, v in metadata},
+        )
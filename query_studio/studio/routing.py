@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import re
+import typing as t
+from collections import Counter
+
+from studio.defaults import DEFAULT_TABLE_COLUMNS
+from studio.models import RoutingDecision
+from studio.utils import load_env
+
+if t.TYPE_CHECKING:
+    from langchain_core.language_models.base import BaseLanguageModel
+
+FAST = "fast"
+STRONG = "strong"
+
+# Pipeline stages that route their own model calls.
+OPTIMIZE = "optimize"
+GENERATE = "generate"
+
+# Relative cost of one call per tier, used to report savings.
+DEFAULT_TIER_COSTS = {FAST: 1.0, STRONG: 4.0}
+
+JOIN_PATTERN = re.compile(
+    r"\b(join(ed|ing)?|combined? with|along with|together with|compared? (to|with)|versus|vs\.?|relative to|correlat\w*|match(ed|ing)?)\b"
+)
+TIME_WINDOW_PATTERN = re.compile(
+    r"\b(day|daily|week|weekly|month|monthly|quarter|quarterly|year|yearly|annual|hour|hourly|weekend|weekday|between|since|ytd|mtd)s?\b"
+)
+TIME_COMPARISON_PATTERN = re.compile(
+    r"\b(over time|trend\w*|growth|grow|change[sd]?|year over year|month over month|week over week|yoy|mom|period)\b"
+)
+NESTED_PATTERN = re.compile(
+    r"\b(top|bottom|rank\w*|percent\w*|ratio|share|proportion|median|percentile|cumulative|running|rolling|moving average|distinct|each|per|for every|without|never|except)\b"
+)
+
+
+def _phrase(name: str) -> str:
+    return name.lower().replace("_", " ")
+
+
+def link_tables(question: str, table_columns: t.Dict[str, t.List[str]]) -> t.List[str]:
+    """
+    Link a question to the tables it most likely needs.
+
+    A table is linked when its name appears in the question outside of a column name, or when
+    the question mentions a multi-word column that only exists in that table. In "orders per
+    fulfillment method", `fulfillment` is part of the `fulfillment_method` column and does not
+    link the `fulfillment` table. Columns shared by several tables and single-word columns such
+    as `total` are too ambiguous to link anything on their own.
+
+    Args:
+        question (str): Natural language or optimized question.
+        table_columns (Dict[str, List[str]]): Columns per qualified table name.
+
+    Returns:
+        List[str]: Linked table names, in `table_columns` order.
+    """
+    text = " " + re.sub(r"[^a-z0-9]+", " ", question.lower().replace("_", " ")) + " "
+    column_owners = Counter(
+        column for columns in table_columns.values() for column in set(columns)
+    )
+
+    names_text = text
+    for column in sorted(column_owners, key=len, reverse=True):
+        if "_" in column:
+            names_text = names_text.replace(f" {_phrase(column)} ", "  ")
+
+    linked = []
+    for table, columns in table_columns.items():
+        name = _phrase(table.split(".")[-1])
+        singular = name[:-1] if name.endswith("s") else name
+        if f" {name} " in names_text or f" {singular} " in names_text:
+            linked.append(table)
+            continue
+        if any(
+            column_owners[column] == 1
+            and "_" in column
+            and f" {_phrase(column)} " in text
+            for column in columns
+        ):
+            linked.append(table)
+    return linked
+
+
+def estimate_complexity(
+    question: str, table_columns: t.Dict[str, t.List[str]]
+) -> t.Tuple[int, t.List[str], t.List[str]]:
+    """
+    Estimate how hard a question is to translate to SQL, without calling a model.
+
+    Args:
+        question (str): Natural language or optimized question.
+        table_columns (Dict[str, List[str]]): Columns per qualified table name.
+
+    Returns:
+        Tuple[int, List[str], List[str]]: The complexity score, the linked tables and the
+            reasons that contributed to the score.
+    """
+    text = question.lower()
+    tables = link_tables(question, table_columns)
+    score = 0
+    reasons = []
+
+    if len(tables) > 1:
+        score += 2 * (len(tables) - 1)
+        reasons.append(f"{len(tables)} tables")
+    if len(tables) > 1 and JOIN_PATTERN.search(text):
+        score += 2
+        reasons.append("join implied")
+
+    windows = {m.group(1) for m in TIME_WINDOW_PATTERN.finditer(text)}
+    if windows:
+        score += 1 if len(windows) == 1 else 2
+        reasons.append(f"time window ({', '.join(sorted(windows))})")
+    if TIME_COMPARISON_PATTERN.search(text):
+        score += 2
+        reasons.append("comparison across periods")
+
+    nested = {m.group(1) for m in NESTED_PATTERN.finditer(text)}
+    if nested:
+        score += len(nested)
+        reasons.append(f"nested aggregation ({', '.join(sorted(nested))})")
+
+    return score, tables, reasons
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        fast_llm: BaseLanguageModel,
+        strong_llm: BaseLanguageModel,
+        table_columns: t.Optional[t.Dict[str, t.List[str]]] = None,
+        threshold: int = 3,
+        costs: t.Optional[t.Dict[str, float]] = None,
+    ):
+        """
+        Initialize the ModelRouter.
+
+        Args:
+            fast_llm (BaseLanguageModel): Fast, cheap model used for simple questions.
+            strong_llm (BaseLanguageModel): Strong model used for complex questions and escalations.
+            table_columns (Optional[Dict[str, List[str]]]): Columns per table used for schema linking.
+            threshold (int): Complexity score from which questions go to the strong model.
+            costs (Optional[Dict[str, float]]): Relative cost of one call per tier.
+        """
+        self.llms = {FAST: fast_llm, STRONG: strong_llm}
+        self.table_columns = table_columns if table_columns else DEFAULT_TABLE_COLUMNS
+        self.threshold = threshold
+        self.costs = costs if costs else DEFAULT_TIER_COSTS
+        self.decisions: t.List[RoutingDecision] = []
+
+    @classmethod
+    def from_env(cls, **kwargs) -> ModelRouter:
+        """
+        Create a router from the `ANTHROPIC_FAST_MODEL` and `ANTHROPIC_MODEL` environment variables.
+
+        Args:
+            **kwargs: Additional keyword arguments passed to the constructor.
+
+        Returns:
+            ModelRouter: A router between the fast and strong Anthropic models.
+        """
+        from langchain_anthropic.chat_models import ChatAnthropic
+
+        env = load_env()
+        fast_model = env.get("ANTHROPIC_FAST_MODEL")
+        strong_model = env.get("ANTHROPIC_MODEL")
+        api_key = env.get("ANTHROPIC_API_KEY")
+
+        if not fast_model or not strong_model or not api_key:
+            raise ValueError(
+                "ANTHROPIC_FAST_MODEL, ANTHROPIC_MODEL and ANTHROPIC_API_KEY must be set to route between models."
+            )
+
+        return cls(
+            fast_llm=ChatAnthropic(model=fast_model, api_key=api_key),
+            strong_llm=ChatAnthropic(model=strong_model, api_key=api_key),
+            **kwargs,
+        )
+
+    @property
+    def strong_llm(self) -> BaseLanguageModel:
+        return self.llms[STRONG]
+
+    def route(self, question: str, stage: str = GENERATE) -> RoutingDecision:
+        """
+        Decide which tier should answer a question.
+
+        Args:
+            question (str): The question to route.
+            stage (str): Pipeline stage asking, `OPTIMIZE` or `GENERATE`.
+
+        Returns:
+            RoutingDecision: The routing decision, not yet recorded.
+        """
+        score, tables, reasons = estimate_complexity(question, self.table_columns)
+        return RoutingDecision(
+            question=question,
+            stage=stage,
+            tier=STRONG if score >= self.threshold else FAST,
+            score=score,
+            tables=[table.split(".")[-1] for table in tables],
+            reasons=reasons,
+        )
+
+    def escalate(
+        self, decision: RoutingDecision, cause: t.Optional[str] = None
+    ) -> RoutingDecision:
+        """
+        Move a decision to the strong tier after a failed or unverifiable fast result.
+
+        Args:
+            decision (RoutingDecision): Decision that was answered on the fast tier.
+            cause (Optional[str]): Why the fast result was rejected, kept in the reasons.
+
+        Returns:
+            RoutingDecision: The escalated decision.
+        """
+        reason = "escalated after fast tier failure"
+        if cause:
+            reason = f"{reason}: {cause}"
+        return decision.model_copy(
+            update={
+                "tier": STRONG,
+                "escalated": True,
+                "reasons": [*decision.reasons, reason],
+            }
+        )
+
+    def record(self, decision: RoutingDecision, latency: float) -> None:
+        """
+        Record a final routing decision and the time spent answering it.
+
+        Args:
+            decision (RoutingDecision): Final decision.
+            latency (float): Total seconds spent, including any escalation.
+        """
+        decision.latency = latency
+        self.decisions.append(decision)
+
+    def _summarize(self, decisions: t.List[RoutingDecision]) -> t.Dict[str, t.Any]:
+        counts = Counter(decision.tier for decision in decisions)
+        escalations = sum(decision.escalated for decision in decisions)
+        cost = sum(
+            self.costs[decision.tier] + (self.costs[FAST] if decision.escalated else 0)
+            for decision in decisions
+        )
+        baseline = self.costs[STRONG] * len(decisions)
+        latencies = [d.latency for d in decisions if d.latency is not None]
+
+        return {
+            "questions": len(decisions),
+            "fast": counts[FAST],
+            "strong": counts[STRONG] - escalations,
+            "escalated": escalations,
+            "cost": cost,
+            "baseline_cost": baseline,
+            "savings": baseline - cost,
+            "mean_latency": sum(latencies) / len(latencies) if latencies else None,
+        }
+
+    def summary(self) -> t.Dict[str, t.Any]:
+        """
+        Summarize the recorded routing decisions per pipeline stage.
+
+        A router shared by `QueryGenerator` and `Text2SQLAgent` sees each question once per
+        stage, so counts and latencies are reported per stage and only costs are added up.
+        Savings are relative to sending every call to the strong model. Escalated calls pay
+        for both tiers.
+
+        Returns:
+            Dict[str, Any]: Counts per tier, escalations, cost, savings and mean latency per
+                stage, and the total cost, baseline cost and savings.
+        """
+        decisions: t.Dict[str, t.List[RoutingDecision]] = {}
+        for decision in self.decisions:
+            decisions.setdefault(decision.stage, []).append(decision)
+        stages = {stage: self._summarize(ds) for stage, ds in decisions.items()}
+
+        cost = sum(stage["cost"] for stage in stages.values())
+        baseline = sum(stage["baseline_cost"] for stage in stages.values())
+        return {
+            "stages": stages,
+            "cost": cost,
+            "baseline_cost": baseline,
+            "savings": baseline - cost,
+        }
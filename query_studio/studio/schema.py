@@ -0,0 +1,419 @@
+import hashlib
+import json
+import os
+import typing as t
+from datetime import datetime, timezone
+
+from studio.models import ColumnInfo, SchemaSnapshot, TableInfo
+from studio.utils import get_db_config
+
+SNAPSHOT_VERSION = 2
+
+RELKINDS = "('r', 'p', 'v', 'm', 'f')"
+
+# Read from pg_attribute rather than information_schema.columns, which does not list the
+# columns of materialized views.
+COLUMNS_QUERY = f"""
+SELECT
+    cls.relname,
+    att.attname,
+    format_type(att.atttypid, NULL),
+    NOT att.attnotnull,
+    col_description(cls.oid, att.attnum)
+FROM pg_catalog.pg_attribute att
+JOIN pg_catalog.pg_class cls ON cls.oid = att.attrelid
+JOIN pg_catalog.pg_namespace ns ON ns.oid = cls.relnamespace
+WHERE ns.nspname = %s
+    AND cls.relkind IN {RELKINDS}
+    AND att.attnum > 0
+    AND NOT att.attisdropped
+ORDER BY cls.relname, att.attnum
+"""
+
+TABLES_QUERY = f"""
+SELECT
+    cls.relname,
+    cls.reltuples::bigint,
+    obj_description(cls.oid, 'pg_class')
+FROM pg_catalog.pg_class cls
+JOIN pg_catalog.pg_namespace ns ON ns.oid = cls.relnamespace
+WHERE ns.nspname = %s AND cls.relkind IN {RELKINDS}
+"""
+
+KEYS_QUERY = """
+SELECT
+    tbl.relname,
+    con.contype,
+    att.attname,
+    ftbl.relname,
+    fatt.attname
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_namespace ns ON ns.oid = con.connamespace
+JOIN pg_catalog.pg_class tbl ON tbl.oid = con.conrelid
+CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+JOIN pg_catalog.pg_attribute att
+    ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+LEFT JOIN pg_catalog.pg_class ftbl ON ftbl.oid = con.confrelid
+LEFT JOIN pg_catalog.pg_attribute fatt
+    ON fatt.attrelid = con.confrelid AND fatt.attnum = k.fattnum
+WHERE ns.nspname = %s AND con.contype IN ('p', 'f')
+"""
+
+
+def _fingerprint(tables: t.List[TableInfo]) -> str:
+    """
+    Compute a stable fingerprint of the catalog structure.
+
+    Row estimates and sample values are excluded so that the fingerprint only
+    changes when tables, columns, types or keys change.
+
+    Args:
+        tables (List[TableInfo]): Introspected tables.
+
+    Returns:
+        str: Hex digest identifying the catalog structure.
+    """
+    structure = [
+        [
+            table.name,
+            [
+                [c.name, c.data_type, c.nullable, c.primary_key, c.references]
+                for c in table.columns
+            ],
+        ]
+        for table in tables
+    ]
+    return hashlib.sha256(json.dumps(structure).encode("utf-8")).hexdigest()
+
+
+def _sample_values(
+    cursor: t.Any, schema: str, table: TableInfo, sample_size: int
+) -> None:
+    """
+    Fill in distinct sample values for every column of a table from a single row sample.
+
+    Args:
+        cursor (Any): Open psycopg2 cursor.
+        schema (str): Schema the table belongs to.
+        table (TableInfo): Table to sample, updated in place.
+        sample_size (int): Maximum number of distinct values kept per column.
+    """
+    from psycopg2 import sql
+
+    cursor.execute(
+        sql.SQL("SELECT * FROM {}.{} LIMIT %s").format(
+            sql.Identifier(schema), sql.Identifier(table.name)
+        ),
+        (sample_size * 10,),
+    )
+    names = [desc[0] for desc in cursor.description]
+    rows = cursor.fetchall()
+
+    for column in table.columns:
+        if column.name not in names:
+            continue
+        idx = names.index(column.name)
+        values: t.List[str] = []
+        for row in rows:
+            value = row[idx]
+            if value is None:
+                continue
+            value = str(value)[:100]
+            if value not in values:
+                values.append(value)
+            if len(values) >= sample_size:
+                break
+        column.sample_values = values
+
+
+def introspect_schema(
+    config: t.Optional[t.Dict[str, str]] = None,
+    schema: str = "gold",
+    sample_size: int = 3,
+) -> SchemaSnapshot:
+    """
+    Read the catalog of a schema once and build a snapshot of it.
+
+    Args:
+        config (Optional[Dict[str, str]]): Database configuration. Defaults to the environment.
+        schema (str): Schema to introspect.
+        sample_size (int): Number of distinct sample values kept per column. Use 0 to skip sampling.
+
+    Returns:
+        SchemaSnapshot: Snapshot of the tables, columns, keys, row estimates and sample values.
+    """
+    import psycopg2
+
+    config = config if config else get_db_config()
+
+    connection = psycopg2.connect(**config)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(TABLES_QUERY, (schema,))
+            tables = {
+                name: TableInfo(name=name, row_estimate=max(rows, 0), comment=comment)
+                for name, rows, comment in cursor.fetchall()
+            }
+
+            cursor.execute(COLUMNS_QUERY, (schema,))
+            for table_name, name, data_type, nullable, comment in cursor.fetchall():
+                table = tables.setdefault(table_name, TableInfo(name=table_name))
+                table.columns.append(
+                    ColumnInfo(
+                        name=name,
+                        data_type=data_type,
+                        nullable=nullable,
+                        comment=comment,
+                    )
+                )
+
+            cursor.execute(KEYS_QUERY, (schema,))
+            for table_name, kind, column, ref_table, ref_column in cursor.fetchall():
+                if table_name not in tables:
+                    continue
+                for col in tables[table_name].columns:
+                    if col.name != column:
+                        continue
+                    if kind == "p":
+                        col.primary_key = True
+                    else:
+                        col.references = f"{ref_table}.{ref_column}"
+
+            if sample_size > 0:
+                for table in tables.values():
+                    _sample_values(cursor, schema, table, sample_size)
+    finally:
+        connection.close()
+
+    tables = [tables[name] for name in sorted(tables)]
+
+    return SchemaSnapshot(
+        version=SNAPSHOT_VERSION,
+        schema_name=schema,
+        created_at=datetime.now(timezone.utc).isoformat(),
+        fingerprint=_fingerprint(tables),
+        tables=tables,
+    )
+
+
+def save_snapshot(snapshot: SchemaSnapshot, path: str) -> None:
+    """
+    Write a schema snapshot to disk as JSON.
+
+    Args:
+        snapshot (SchemaSnapshot): Snapshot to save.
+        path (str): Destination file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(snapshot.model_dump_json(indent=2))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> SchemaSnapshot:
+    """
+    Load a schema snapshot from disk.
+
+    Args:
+        path (str): Snapshot file.
+
+    Returns:
+        SchemaSnapshot: The loaded snapshot.
+
+    Raises:
+        ValueError: If the snapshot was written by an incompatible version.
+    """
+    with open(path) as f:
+        snapshot = SchemaSnapshot.model_validate_json(f.read())
+
+    if snapshot.version != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Schema snapshot {path} has version {snapshot.version}, expected {SNAPSHOT_VERSION}. "
+            "Re-run the introspection to refresh it."
+        )
+    return snapshot
+
+
+def load_or_introspect_schema(
+    path: str,
+    config: t.Optional[t.Dict[str, str]] = None,
+    schema: str = "gold",
+    refresh: bool = False,
+    sample_size: int = 3,
+    check_drift: bool = False,
+) -> SchemaSnapshot:
+    """
+    Load a cached schema snapshot, introspecting the database only when needed.
+
+    With `check_drift`, the catalog is read without sampling and its fingerprint compared
+    to the cached one, so the snapshot is rebuilt when tables, columns, types or keys
+    changed since it was written.
+
+    Args:
+        path (str): Snapshot file.
+        config (Optional[Dict[str, str]]): Database configuration. Defaults to the environment.
+        schema (str): Schema to introspect.
+        refresh (bool): Force a new introspection even if a snapshot exists.
+        sample_size (int): Number of distinct sample values kept per column.
+        check_drift (bool): Rebuild the cached snapshot if the catalog structure changed.
+
+    Returns:
+        SchemaSnapshot: The cached or freshly introspected snapshot.
+    """
+    if not refresh and os.path.exists(path):
+        try:
+            snapshot = load_snapshot(path)
+        except ValueError:
+            snapshot = None
+
+        if snapshot is not None and snapshot.schema_name == schema:
+            if not check_drift:
+                return snapshot
+            current = introspect_schema(config=config, schema=schema, sample_size=0)
+            if current.fingerprint == snapshot.fingerprint:
+                return snapshot
+
+    snapshot = introspect_schema(config=config, schema=schema, sample_size=sample_size)
+    save_snapshot(snapshot, path)
+    return snapshot
+
+
+def get_table_columns(snapshot: SchemaSnapshot) -> t.Dict[str, t.List[str]]:
+    """
+    Build the `schema.table -> columns` mapping used by `Text2SQLAgent`.
+
+    Args:
+        snapshot (SchemaSnapshot): Schema snapshot.
+
+    Returns:
+        Dict[str, List[str]]: Column names per qualified table name.
+    """
+    return {
+        f"{snapshot.schema_name}.{table.name}": [c.name for c in table.columns]
+        for table in snapshot.tables
+    }
+
+
+def render_table_schema(snapshot: SchemaSnapshot) -> str:
+    """
+    Render a snapshot in the `DEFAULT_TABLE_SCHEMA` text format.
+
+    Args:
+        snapshot (SchemaSnapshot): Schema snapshot.
+
+    Returns:
+        str: Table schema description for the prompts.
+    """
+    blocks = []
+    relationships = []
+
+    for table in snapshot.tables:
+        lines = [f"Table: {table.name}"]
+        for column in table.columns:
+            attributes = [column.data_type]
+            if column.nullable:
+                attributes.append("nullable")
+            notes = []
+            if column.primary_key:
+                notes.append("Primary key")
+            if column.references:
+                notes.append(f"References {column.references}")
+                relationships.append(
+                    f"{table.name}.{column.name} links to {column.references}"
+                )
+            if column.comment:
+                notes.append(column.comment)
+            if column.sample_values:
+                notes.append("e.g. " + ", ".join(repr(v) for v in column.sample_values))
+            line = f"- {column.name} ({', '.join(attributes)})"
+            if notes:
+                line += ": " + "; ".join(notes)
+            lines.append(line)
+        blocks.append("\n".join(lines))
+
+    if relationships:
+        blocks.append(
+            "Key Relationships:\n"
+            + "\n".join(f"{i}. {r}" for i, r in enumerate(relationships, start=1))
+        )
+
+    return "\n\n".join(blocks)
+
+
+def render_table_descriptions(snapshot: SchemaSnapshot) -> t.Optional[str]:
+    """
+    Render the table comments of a snapshot in the `DEFAULT_TABLE_DESCRIPTIONS` format.
+
+    Args:
+        snapshot (SchemaSnapshot): Schema snapshot.
+
+    Returns:
+        Optional[str]: Table descriptions, or None if no table carries a comment.
+    """
+    described = [table for table in snapshot.tables if table.comment]
+    if not described:
+        return None
+
+    lines = ["Table Purposes and Context:"]
+    for i, table in enumerate(described, start=1):
+        lines.append(f"\n{i}. {table.name} Table:")
+        lines.append(f"    - {table.comment}")
+        if table.row_estimate is not None:
+            lines.append(f"    - Approximately {table.row_estimate} rows")
+    return "\n".join(lines)
+
+
+def render_table_info(snapshot: SchemaSnapshot, table_names: t.List[str]) -> str:
+    """
+    Render `CREATE TABLE` statements with sample values, as returned by `sql_db_schema`.
+
+    Args:
+        snapshot (SchemaSnapshot): Schema snapshot.
+        table_names (List[str]): Tables to describe.
+
+    Returns:
+        str: Table info for the requested tables.
+    """
+    tables = {table.name: table for table in snapshot.tables}
+    statements = []
+
+    for name in table_names:
+        table = tables[name]
+        definitions = []
+        for column in table.columns:
+            definition = f"\t{column.name} {column.data_type.upper()}"
+            if not column.nullable:
+                definition += " NOT NULL"
+            definitions.append(definition)
+
+        primary_key = [c.name for c in table.columns if c.primary_key]
+        if primary_key:
+            definitions.append(f"\tPRIMARY KEY ({', '.join(primary_key)})")
+        for column in table.columns:
+            if column.references:
+                ref_table, ref_column = column.references.split(".", 1)
+                definitions.append(
+                    f"\tFOREIGN KEY({column.name}) REFERENCES {ref_table} ({ref_column})"
+                )
+
+        statement = f"CREATE TABLE {table.name} (\n" + ",\n".join(definitions) + "\n)"
+
+        notes = []
+        if table.row_estimate is not None:
+            notes.append(
+                f"Approximately {table.row_estimate} rows in {table.name} table."
+            )
+        notes.extend(
+            f"{c.name}: {', '.join(c.sample_values)}"
+            for c in table.columns
+            if c.sample_values
+        )
+        if notes:
+            statement += "\n\n/*\n" + "\n".join(notes) + "\n*/"
+        statements.append(statement)
+
+    return "\n\n".join(statements)
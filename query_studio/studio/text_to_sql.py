@@ -1,39 +1,65 @@
+from __future__ import annotations
+
 import asyncio
+import time
 import traceback
 import typing as t
+from functools import cached_property
 
-import pandas as pd
-import psycopg2
-from langchain.agents import create_sql_agent
-from langchain.agents.agent import AgentExecutor
-from langchain.agents.agent_types import AgentType
-from langchain.utilities import SQLDatabase
-from langchain_anthropic import ChatAnthropic
-from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain_core.language_models.base import BaseLanguageModel
 from studio.defaults import DEFAULT_TABLE_COLUMNS
-from studio.models import Question
-from studio.utils import get_db_config
+from studio.models import Question, SchemaSnapshot
+from studio.pool import EndpointBalancer, can_declare_cursor, is_read_only
+from studio.routing import FAST, GENERATE, STRONG
+from studio.schema import get_table_columns
+from studio.utils import get_db_endpoints
 from tqdm import tqdm
 
+if t.TYPE_CHECKING:
+    from langchain.agents.agent import AgentExecutor
+    from langchain_anthropic import ChatAnthropic
+    from langchain_community.utilities import SQLDatabase
+    from langchain_core.language_models.base import BaseLanguageModel
+    from studio.records import ResultStore
+    from studio.routing import ModelRouter
+
 
-def get_db(config: t.Dict[str, t.Any]) -> SQLDatabase:
+def get_db(
+    config: t.Dict[str, t.Any],
+    balancer: t.Optional[EndpointBalancer] = None,
+    **kwargs,
+) -> SQLDatabase:
     """
     Create a SQLDatabase instance from the given configuration.
 
     Args:
         config (Dict[str, Any]): Database configuration.
+        balancer (Optional[EndpointBalancer]): Spreads read-only queries over read replicas.
+            `config` must be the primary endpoint of the balancer.
+        **kwargs: Additional keyword arguments passed to `SQLDatabase.from_uri`.
 
     Returns:
         SQLDatabase: An instance of SQLDatabase.
     """
+    from langchain_community.utilities import SQLDatabase
 
     DB_URI = (
         "postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}"
     ).format(**config)
 
+    if balancer is not None:
+        from studio.tools import BalancedSQLDatabase
+
+        return BalancedSQLDatabase.from_uri(
+            DB_URI,
+            engine_args={"connect_args": {"options": "-c search_path=gold"}},
+            balancer=balancer,
+            **kwargs,
+        )
+
     sql_database = SQLDatabase.from_uri(
-        DB_URI, engine_args={"connect_args": {"options": "-c search_path=gold"}}
+        DB_URI,
+        engine_args={"connect_args": {"options": "-c search_path=gold"}},
+        **kwargs,
     )
     return sql_database
 
@@ -44,6 +70,9 @@ class Text2SQLAgent:
         llm: ChatAnthropic,
         config: t.Optional[t.Dict[str, str]] = None,
         table_columns: t.Optional[str] = None,
+        snapshot: t.Optional[SchemaSnapshot] = None,
+        router: t.Optional[ModelRouter] = None,
+        endpoints: t.Optional[t.List[t.Dict[str, str]]] = None,
         **kwargs,
     ):
         """
@@ -52,21 +81,74 @@ class Text2SQLAgent:
         Args:
             llm (ChatAnthropic): Language model instance.
             config (Dict[str, Any]): Database configuration.
+            table_columns (Optional[Dict[str, List[str]]]): Columns per table used in the prompt.
+            snapshot (Optional[SchemaSnapshot]): Cached schema snapshot. When given, the agent's
+                schema tools answer from it instead of querying the database catalog.
+            router (Optional[ModelRouter]): Routes each question to a fast or strong model.
+                Defaults to using `llm` for everything.
+            endpoints (Optional[List[Dict[str, str]]]): Configurations of the primary and its read
+                replicas, primary first. Defaults to `[config]`, or to the primary and
+                `DB_REPLICA_HOSTS` from the environment when `config` is not given.
+            **kwargs: Additional keyword arguments. `profile_results=True` streams each result to
+                compute a profile stored next to the sample rows, in chunks of `profile_chunk_size` rows.
+
+        The database engine and the agent executors are created on first use, so
+        constructing the agent neither connects to the database nor builds the agent.
         """
+        if llm is None and router is None:
+            raise ValueError("Either a language model or a router must be provided.")
+
+        if endpoints is None:
+            endpoints = [config] if config else get_db_endpoints()
+        self.endpoints = endpoints
+        self.db_config: t.Dict[str, str] = endpoints[0]
+        self.max_failures = kwargs.get("max_failures", 3)
+        self.ejection_time = kwargs.get("ejection_time", 30.0)
+        self.profile_results = kwargs.get("profile_results", False)
+        self.profile_chunk_size = kwargs.get("profile_chunk_size", 10000)
+        self.snapshot = snapshot
+        self.router = router
+        self.llm: BaseLanguageModel = llm if llm else router.strong_llm
+
+        if table_columns:
+            self.table_columns = table_columns
+        elif snapshot is not None:
+            self.table_columns = get_table_columns(snapshot)
+        else:
+            self.table_columns = DEFAULT_TABLE_COLUMNS
+
+    @cached_property
+    def balancer(self) -> EndpointBalancer:
+        return EndpointBalancer(
+            self.endpoints,
+            max_failures=self.max_failures,
+            ejection_time=self.ejection_time,
+        )
 
-        if config is None:
-            self.db_config: t.Dict[str, str] = get_db_config()
-
-        self.db: SQLDatabase = get_db(config=self.db_config)
-        self.llm: BaseLanguageModel = llm
-        self.agent_executor: AgentExecutor = self._get_sql_agent_executor(
-            self.db, self.llm
+    @cached_property
+    def db(self) -> SQLDatabase:
+        return get_db(
+            config=self.db_config,
+            balancer=self.balancer if len(self.endpoints) > 1 else None,
+            lazy_table_reflection=self.snapshot is not None,
         )
-        self.table_columns = table_columns if table_columns else DEFAULT_TABLE_COLUMNS
+
+    @cached_property
+    def agent_executor(self) -> AgentExecutor:
+        return self._get_sql_agent_executor(self.db, self.llm, self.snapshot)
+
+    @cached_property
+    def agent_executors(self) -> t.Dict[str, AgentExecutor]:
+        return {
+            tier: self._get_sql_agent_executor(self.db, tier_llm, self.snapshot)
+            for tier, tier_llm in self.router.llms.items()
+        }
 
     @staticmethod
     def _get_sql_agent_executor(
-        db: SQLDatabase, llm: BaseLanguageModel
+        db: SQLDatabase,
+        llm: BaseLanguageModel,
+        snapshot: t.Optional[SchemaSnapshot] = None,
     ) -> AgentExecutor:
         """
         Create a SQL agent executor.
@@ -74,13 +156,24 @@ class Text2SQLAgent:
         Args:
             db (SQLDatabase): SQLDatabase instance.
             llm (ChatAnthropic): Language model instance.
+            snapshot (Optional[SchemaSnapshot]): Schema snapshot backing the schema tools.
 
         Returns:
             Any: SQL agent executor.
         """
+        from langchain.agents import create_sql_agent
+        from langchain.agents.agent_types import AgentType
+        from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+        from studio.tools import SnapshotSQLDatabaseToolkit
+
+        if snapshot is not None:
+            toolkit = SnapshotSQLDatabaseToolkit(db=db, llm=llm, snapshot=snapshot)
+        else:
+            toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+
         agent_executor: AgentExecutor = create_sql_agent(
             llm=llm,
-            toolkit=SQLDatabaseToolkit(db=db, llm=llm),
+            toolkit=toolkit,
             verbose=True,
             agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
             agent_executor_kwargs=dict(
@@ -105,41 +198,116 @@ class Text2SQLAgent:
         return sql_code
 
     async def generate_sql_from_text(
-        self, questions: t.Union[t.List[str], t.List[Question]]
-    ) -> t.List[t.Dict[str, t.Any]]:
+        self,
+        questions: t.Union[t.List[str], t.List[Question]],
+        store: t.Optional[ResultStore] = None,
+    ) -> t.Sequence[t.Dict[str, t.Any]]:
         """
         Generate SQL code and chain of thought for a given question or list of questions.
 
         Args:
             questions (Union[str, List[str]]): User question or list of questions.
+            store (Optional[ResultStore]): Compact store to append results to, for large runs.
 
         Returns:
-            List[Dict[str, Any]]: List of dictionaries containing input question, SQL code, chain of thought, output, and data.
+            Sequence[Dict[str, Any]]: List of dictionaries containing input question, SQL code, chain of thought, output, and data.
+                The given `store` is returned when provided.
         """
 
-        results = []
+        results = store if store is not None else []
 
         for question in tqdm(questions):
-            if isinstance(question, Question):
-                question = question.question
-            if isinstance(question, str):
-                question = question
-
-            result: t.Dict[str,] = await self._generate_sql_and_chain_of_thought(
-                question
-            )
+            result: t.Dict[str,] = await self.generate_sql(question)
             results.append(result)
 
         return results
 
+    async def generate_sql(
+        self, question: t.Union[str, Question]
+    ) -> t.Dict[str, t.Any]:
+        """
+        Generate SQL code and chain of thought for a single question.
+
+        Args:
+            question (Union[str, Question]): User question.
+
+        Returns:
+            Dict[str, Any]: Dictionary containing input question, SQL code, chain of thought, output, and data.
+        """
+        if isinstance(question, Question):
+            question = question.question
+
+        if self.router is None:
+            return await self._generate_sql_and_chain_of_thought(question)
+        return await self._generate_with_routing(question)
+
+    @staticmethod
+    def is_verified(result: t.Dict[str, t.Any]) -> bool:
+        """
+        Check whether a result produced SQL that executed without errors.
+
+        Args:
+            result (Dict[str, Any]): Result of `_generate_sql_and_chain_of_thought`.
+
+        Returns:
+            bool: True if the result has SQL code and its data is not an error.
+        """
+        if "error" in result or not result.get("sql_code"):
+            return False
+        data = result.get("data")
+        return not (isinstance(data, dict) and "error" in data)
+
+    @staticmethod
+    def _failure_cause(result: t.Dict[str, t.Any]) -> str:
+        """
+        Describe why a result did not pass `is_verified`.
+
+        Args:
+            result (Dict[str, Any]): Result of `_generate_sql_and_chain_of_thought`.
+
+        Returns:
+            str: The exception type and message of the failure, or a short description.
+        """
+        data = result.get("data")
+        for error in (result, data):
+            if isinstance(error, dict) and "error" in error:
+                return f"{error.get('exception_type', 'Error')}: {error['error']}"
+        return "no SQL code"
+
+    async def _generate_with_routing(self, query: str) -> t.Dict[str, t.Any]:
+        """
+        Generate SQL on the tier chosen by the router, escalating unverified results to the strong tier.
+
+        Args:
+            query (str): User query.
+
+        Returns:
+            Dict[str, Any]: Result of the final tier, including the `model_tier` used.
+        """
+        decision = self.router.route(query, stage=GENERATE)
+        start = time.perf_counter()
+
+        result = await self._generate_sql_and_chain_of_thought(
+            query, self.agent_executors[decision.tier]
+        )
+        if decision.tier == FAST and not self.is_verified(result):
+            decision = self.router.escalate(decision, self._failure_cause(result))
+            result = await self._generate_sql_and_chain_of_thought(
+                query, self.agent_executors[STRONG]
+            )
+
+        self.router.record(decision, time.perf_counter() - start)
+        return {**result, "model_tier": decision.tier}
+
     async def _generate_sql_and_chain_of_thought(
-        self, query: str
+        self, query: str, agent_executor: t.Optional[AgentExecutor] = None
     ) -> t.Dict[str, t.Any]:
         """
         Generate SQL code and chain of thought for a given query.
 
         Args:
             query (str): User query.
+            agent_executor (Optional[AgentExecutor]): Executor to use. Defaults to `self.agent_executor`.
 
         Returns:
             Dict[str, Any]: Dictionary containing input query, SQL code, chain of thought, output, and data.
@@ -154,7 +322,8 @@ class Text2SQLAgent:
         )
 
         try:
-            response = await self.agent_executor.ainvoke(prompt)
+            agent_executor = agent_executor if agent_executor else self.agent_executor
+            response = await agent_executor.ainvoke(prompt)
 
             steps = self.get_chain_of_thoughts(response)
             sql_code = self.get_sql_from_steps(steps)
@@ -162,13 +331,21 @@ class Text2SQLAgent:
             if "```" in sql_code:
                 sql_code = sql_code.strip("```sql").strip("```")
 
-            return {
+            result = {
                 "input": query,
                 "sql_code": sql_code,
                 "chain_of_thought": steps,
                 "output": response["output"],
-                "data": self.get_data_from_sql(sql_code),
             }
+            if self.profile_results:
+                result["data"], result["profile"] = await asyncio.to_thread(
+                    self.get_profile_from_sql, sql_code
+                )
+            else:
+                result["data"] = await asyncio.to_thread(
+                    self.get_data_from_sql, sql_code
+                )
+            return result
 
         except asyncio.TimeoutError as e:
             return {
@@ -250,40 +427,131 @@ class Text2SQLAgent:
         Returns:
             Union[pd.DataFrame, Dict[str, Any]]: DataFrame containing the result or a dictionary with error information.
         """
-        with psycopg2.connect(
-            **self.db_config, options="-c search_path=gold"
-        ) as connection:
+        import pandas as pd
+
+        try:
+            columns, rows = self.balancer.execute(
+                lambda endpoint: self._fetch_rows(endpoint.config, sql_code),
+                read_only=is_read_only(sql_code),
+            )
+        except Exception as e:
+            return {
+                "error": str(e),
+                "exception_type": type(e).__name__,
+                "input": sql_code,
+                "traceback": traceback.format_exc(),
+            }
+
+        if rows:
             try:
+                df = pd.DataFrame(rows, columns=columns)
+                return df.head().to_dict(orient="records")
+            except Exception as e:
+                return {
+                    "error": "Failed to convert rows to DataFrame",
+                    "exception_type": type(e).__name__,
+                    "traceback": traceback.format_exc(),
+                    "input": rows,
+                }
+        else:
+            return {}
+
+    def get_profile_from_sql(
+        self, sql_code: str
+    ) -> t.Tuple[
+        t.Union[t.List[t.Dict[str, t.Any]], t.Dict[str, t.Any]], t.Dict[str, t.Any]
+    ]:
+        """
+        Execute SQL code and profile the full result without holding it in memory.
+
+        Args:
+            sql_code (str): SQL code.
+
+        Returns:
+            Tuple[Union[List[Dict[str, Any]], Dict[str, Any]], Dict[str, Any]]: The first rows as records,
+                or a dictionary with error information, and the result profile.
+        """
+        try:
+            samples, profile = self.balancer.execute(
+                lambda endpoint: self._profile_rows(
+                    endpoint.config, sql_code, self.profile_chunk_size
+                ),
+                read_only=is_read_only(sql_code),
+            )
+        except Exception as e:
+            return {
+                "error": str(e),
+                "exception_type": type(e).__name__,
+                "input": sql_code,
+                "traceback": traceback.format_exc(),
+            }, {}
+
+        return (samples if samples else {}), profile
+
+    @staticmethod
+    def _profile_rows(
+        config: t.Dict[str, str], sql_code: str, chunk_size: int
+    ) -> t.Tuple[t.List[t.Dict[str, t.Any]], t.Dict[str, t.Any]]:
+        """
+        Execute SQL code on one endpoint and profile its result chunk by chunk.
+
+        Read-only `SELECT`, `WITH`, `VALUES` and `TABLE` queries run on a server-side cursor so
+        that only one chunk is fetched at a time. Other statements use a client-side cursor.
+
+        Args:
+            config (Dict[str, str]): Database configuration of the endpoint.
+            sql_code (str): SQL code.
+            chunk_size (int): Rows fetched per chunk.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, Any]]: The sample records and the result profile.
+        """
+        import psycopg2
+        from studio.profiling import profile_cursor
+
+        connection = psycopg2.connect(**config, options="-c search_path=gold")
+        try:
+            with connection:
                 with connection.cursor() as cursor:
                     cursor.execute(
                         "SET search_path TO gold;"
                     )  # Explicitly set search path
+
+                name = "studio_profile" if can_declare_cursor(sql_code) else None
+                with connection.cursor(name=name) as cursor:
+                    cursor.itersize = chunk_size
                     cursor.execute(sql_code)
-                    columns = (
-                        [desc[0] for desc in cursor.description]
-                        if cursor.description
-                        else []
-                    )
-                    rows = cursor.fetchall() if columns else []
-
-                    if rows:
-                        try:
-                            df = pd.DataFrame(rows, columns=columns)
-                            return df.head().to_dict(orient="records")
-                        except Exception as e:
-                            return {
-                                "error": "Failed to convert rows to DataFrame",
-                                "exception_type": type(e).__name__,
-                                "traceback": traceback.format_exc(),
-                                "input": rows,
-                            }
-                    else:
-                        return {}
+                    return profile_cursor(cursor, chunk_size=chunk_size)
+        finally:
+            connection.close()
 
-            except Exception as e:
-                return {
-                    "error": str(e),
-                    "exception_type": type(e).__name__,
-                    "input": sql_code,
-                    "traceback": traceback.format_exc(),
-                }
+    @staticmethod
+    def _fetch_rows(
+        config: t.Dict[str, str], sql_code: str
+    ) -> t.Tuple[t.List[str], t.List[tuple]]:
+        """
+        Execute SQL code on one endpoint and fetch the result.
+
+        Args:
+            config (Dict[str, str]): Database configuration of the endpoint.
+            sql_code (str): SQL code.
+
+        Returns:
+            Tuple[List[str], List[tuple]]: Column names and rows.
+        """
+        import psycopg2
+
+        connection = psycopg2.connect(**config, options="-c search_path=gold")
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute("SET search_path TO gold;")  # Explicitly set search path
+                cursor.execute(sql_code)
+                columns = (
+                    [desc[0] for desc in cursor.description]
+                    if cursor.description
+                    else []
+                )
+                rows = cursor.fetchall() if columns else []
+                return columns, rows
+        finally:
+            connection.close()
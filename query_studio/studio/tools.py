@@ -0,0 +1,127 @@
+import typing as t
+
+from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from langchain_community.utilities import SQLDatabase
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
+from studio.models import SchemaSnapshot
+from studio.pool import Endpoint, EndpointBalancer, is_read_only
+from studio.schema import render_table_info
+
+
+class _ListTablesInput(BaseModel):
+    tool_input: str = Field("", description="An empty string")
+
+
+class _TableInfoInput(BaseModel):
+    table_names: str = Field(
+        ...,
+        description="A comma-separated list of the table names for which to return the schema. Example input: 'table1, table2, table3'",
+    )
+
+
+class SnapshotListTablesTool(BaseTool):
+    """List the tables of a schema snapshot without querying the database."""
+
+    name: str = "sql_db_list_tables"
+    description: str = "Input is an empty string, output is a comma-separated list of tables in the database."
+    args_schema: t.Type[BaseModel] = _ListTablesInput
+    snapshot: SchemaSnapshot
+
+    def _run(
+        self,
+        tool_input: str = "",
+        run_manager: t.Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        return ", ".join(table.name for table in self.snapshot.tables)
+
+
+class SnapshotTableInfoTool(BaseTool):
+    """Describe tables from a schema snapshot without querying the database."""
+
+    name: str = "sql_db_schema"
+    description: str = (
+        "Input to this tool is a comma-separated list of tables, output is the schema and sample rows for those tables. "
+        "Be sure that the tables actually exist by calling sql_db_list_tables first! "
+        "Example Input: table1, table2, table3"
+    )
+    args_schema: t.Type[BaseModel] = _TableInfoInput
+    snapshot: SchemaSnapshot
+
+    def _run(
+        self,
+        table_names: str,
+        run_manager: t.Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        known = {table.name for table in self.snapshot.tables}
+        prefix = f"{self.snapshot.schema_name}."
+        requested = [
+            name.strip().strip('"').removeprefix(prefix)
+            for name in table_names.split(",")
+            if name.strip()
+        ]
+
+        missing = [name for name in requested if name not in known]
+        if missing:
+            return f"Error: table_names {set(missing)} not found in database"
+
+        return render_table_info(self.snapshot, requested)
+
+
+class SnapshotSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """SQL toolkit whose schema tools answer from a cached `SchemaSnapshot`."""
+
+    snapshot: SchemaSnapshot
+
+    def get_tools(self) -> t.List[BaseTool]:
+        snapshot_tools = {
+            "sql_db_list_tables": SnapshotListTablesTool(snapshot=self.snapshot),
+            "sql_db_schema": SnapshotTableInfoTool(snapshot=self.snapshot),
+        }
+        return [snapshot_tools.get(tool.name, tool) for tool in super().get_tools()]
+
+
+class BalancedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase that spreads queries over the primary and its read replicas.
+
+    Schema lookups use the primary engine. `run`, which the `sql_db_query` tool goes through,
+    picks an endpoint from the balancer and fails over to another one on connection errors.
+    """
+
+    def __init__(self, *args: t.Any, balancer: EndpointBalancer, **kwargs: t.Any):
+        super().__init__(*args, **kwargs)
+        self._balancer = balancer
+        self._replicas: t.Dict[str, SQLDatabase] = {}
+
+    def _replica_for(self, endpoint: Endpoint) -> SQLDatabase:
+        if endpoint.name not in self._replicas:
+            from studio.text_to_sql import get_db
+
+            self._replicas[endpoint.name] = get_db(
+                endpoint.config, lazy_table_reflection=True
+            )
+        return self._replicas[endpoint.name]
+
+    def run(
+        self,
+        command: t.Any,
+        fetch: str = "all",
+        include_columns: bool = False,
+        **kwargs: t.Any,
+    ) -> t.Any:
+        def execute(endpoint: Endpoint) -> t.Any:
+            if endpoint is self._balancer.primary:
+                return SQLDatabase.run(
+                    self,
+                    command,
+                    fetch=fetch,
+                    include_columns=include_columns,
+                    **kwargs,
+                )
+            return self._replica_for(endpoint).run(
+                command, fetch=fetch, include_columns=include_columns, **kwargs
+            )
+
+        return self._balancer.execute(execute, read_only=is_read_only(str(command)))
@@ -1,5 +1,12 @@
 import os
-from typing import Dict
+import subprocess
+import sys
+from typing import Dict, Iterable, List
+
+# Seconds a fresh interpreter may spend importing each studio entry-point module.
+IMPORT_TIME_BUDGET = 0.5
+
+STUDIO_MODULES = ("studio.query_generator", "studio.text_to_sql")
 
 
 def load_env_variable(var_name: str) -> str:
@@ -47,3 +54,75 @@ def get_db_config() -> Dict[str, str]:
     }
 
     return db_config
+
+
+def get_db_endpoints() -> List[Dict[str, str]]:
+    """
+    Get the configuration of the primary database and its read replicas.
+
+    Replicas are read from `DB_REPLICA_HOSTS` as a comma-separated list of `host` or
+    `host:port` entries. They share the credentials and database name of the primary.
+
+    Returns:
+        List[Dict[str, str]]: Database configurations, primary first.
+    """
+    primary = get_db_config()
+    endpoints = [primary]
+
+    for entry in os.getenv("DB_REPLICA_HOSTS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        endpoints.append({**primary, "host": host, "port": port or primary["port"]})
+
+    return endpoints
+
+
+def measure_import_time(module: str) -> float:
+    """
+    Measure how long a fresh interpreter takes to import a module.
+
+    Uses `python -X importtime` so that the measurement is cold and includes every
+    transitive import, regardless of what the current process has already imported.
+
+    Args:
+        module (str): Dotted module name, e.g. `studio.text_to_sql`.
+
+    Returns:
+        float: Cumulative import time in seconds.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=package_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+
+    raise RuntimeError(f"Could not find import time of {module}.")
+
+
+def check_import_budget(
+    modules: Iterable[str] = STUDIO_MODULES, budget: float = IMPORT_TIME_BUDGET
+) -> Dict[str, float]:
+    """
+    Check that modules import within the startup budget.
+
+    Args:
+        modules (Iterable[str]): Modules to measure.
+        budget (float): Maximum import time in seconds per module.
+
+    Returns:
+        Dict[str, float]: Import time in seconds per module that exceeds the budget.
+    """
+    times = {module: measure_import_time(module) for module in modules}
+    return {module: seconds for module, seconds in times.items() if seconds > budget}